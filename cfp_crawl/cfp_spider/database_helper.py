@@ -1,5 +1,6 @@
 import sqlite3
-from typing import List
+import threading
+from typing import List, Tuple
 
 
 class DatabaseHelper:
@@ -7,11 +8,14 @@ class DatabaseHelper:
     Database helper for Conference Items
     """
 
+    # Per-thread connections reused across calls, keyed by database path
+    _conn = threading.local()
+
     @staticmethod
     def create_db(dbpath):
         """ Create the necessary tables for the conference database
         """
-        conn = sqlite3.connect(str(dbpath))
+        conn = DatabaseHelper._get_conn(dbpath)
         cur = conn.cursor()
         cur.execute("CREATE TABLE IF NOT EXISTS WikicfpConferences (\
             id INTEGER NOT NULL PRIMARY KEY,\
@@ -37,13 +41,38 @@ class DatabaseHelper:
 
         conn.commit()
         cur.close()
-        conn.close()
+
+    @staticmethod
+    def _get_conn(dbpath):
+        """ Returns this thread's connection to the database, opening it on first use
+        - WAL journal and NORMAL sync avoid an fsync on every commit
+        """
+        dbpath = str(dbpath)
+        if not hasattr(DatabaseHelper._conn, 'connections'):
+            DatabaseHelper._conn.connections = {}
+        connections = DatabaseHelper._conn.connections
+        if dbpath not in connections:
+            conn = sqlite3.connect(dbpath)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
+            connections[dbpath] = conn
+        return connections[dbpath]
+
+    @staticmethod
+    def close_connections():
+        """ Closes the connections opened by this thread
+        """
+        for conn in getattr(DatabaseHelper._conn, 'connections', {}).values():
+            conn.close()
+        DatabaseHelper._conn.connections = {}
 
     @staticmethod
     def add_wikicfp_conf(conference: 'WikiConferenceItem', dbpath: str):
         """ Adds Conference information scraped from wikicfp
         """
-        conn = sqlite3.connect(str(dbpath))
+        conn = DatabaseHelper._get_conn(dbpath)
         cur = conn.cursor()
         cur.execute(
             "INSERT OR REPLACE INTO WikicfpConferences\
@@ -64,40 +93,32 @@ class DatabaseHelper:
         conf_id = cur.lastrowid
         conn.commit()
         cur.close()
-        conn.close()
         return conf_id
 
     @staticmethod
-    def mark_accessibility(conf_id: int, access_status: str, dbpath: str):
-        """ Marks the accessibility attribute of a Conference url retrieved from wikicfp
+    def mark_accessibility(updates: List[Tuple[str, int]], dbpath: str):
+        """ Marks the accessibility attribute of Conference urls retrieved from wikicfp
+        - updates: list of (access_status, conf_id)
         """
-        conn = sqlite3.connect(str(dbpath))
-        cur = conn.cursor()
-        cur.execute(
-            'UPDATE WikicfpConferences SET accessible = "{}" WHERE id = "{}"'.format(
-                access_status, conf_id)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        conn = DatabaseHelper._get_conn(dbpath)
+        with conn:
+            conn.executemany(
+                "UPDATE WikicfpConferences SET accessible=? WHERE id=?", updates)
 
     @staticmethod
     def mark_crawled(conf_id: int, dbpath: str):
-        conn = sqlite3.connect(str(dbpath))
+        conn = DatabaseHelper._get_conn(dbpath)
         cur = conn.cursor()
         cur.execute(
-            'UPDATE WikicfpConferences SET crawled = "{}" WHERE id = "{}"'.format(
-                'Yes', conf_id)
-        )
+            "UPDATE WikicfpConferences SET crawled=? WHERE id=?", ('Yes', conf_id))
         conn.commit()
         cur.close()
-        conn.close()
 
     @staticmethod
     def add_page(conference_page: 'ConferencePageItem', dbpath: str):
         """ Adds page of Conference
         """
-        conn = sqlite3.connect(str(dbpath))
+        conn = DatabaseHelper._get_conn(dbpath)
         cur = conn.cursor()
         cur.execute(
             "INSERT OR REPLACE INTO ConferencePages\
@@ -113,19 +134,17 @@ class DatabaseHelper:
         page_id = cur.lastrowid
         conn.commit()
         cur.close()
-        conn.close()
         return page_id
 
     @staticmethod
     def page_saved(page_url: str, dbpath: str):
         """ Check if page has already been saved
         """
-        conn = sqlite3.connect(str(dbpath))
+        conn = DatabaseHelper._get_conn(dbpath)
         cur = conn.cursor()
         page_with_url = cur.execute(
             "SELECT count(*) FROM ConferencePages\
             WHERE url=?", (page_url,)
         ).fetchone()
         cur.close()
-        conn.close()
         return page_with_url[0] > 0
\ No newline at end of file
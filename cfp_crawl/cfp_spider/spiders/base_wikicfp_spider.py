@@ -38,10 +38,10 @@ class BaseCfpSpider(scrapy.spiders.CrawlSpider):
         try:
             if get_url_status(conf_url) == 200:
                 DatabaseHelper.mark_accessibility(
-                    conf_id, "Accessible URL", DB_FILEPATH)
+                    [("Accessible URL", conf_id)], DB_FILEPATH)
         except Exception as e:
             DatabaseHelper.mark_accessibility(
-                conf_id, e.__class__.__name__, DB_FILEPATH)
+                [(e.__class__.__name__, conf_id)], DB_FILEPATH)
             return scrapy.spiders.Request(url=wayback_url, dont_filter=True, meta=meta,	
                                             callback=self.process_wayback_url)
 
@@ -51,4 +51,10 @@ class BaseCfpSpider(scrapy.spiders.CrawlSpider):
         """
         conf_id = response.meta['conf_id']
         DatabaseHelper.mark_accessibility(
-            conf_id, "Wayback Accessible", DB_FILEPATH)
+            [("Wayback Accessible", conf_id)], DB_FILEPATH)
+
+    def closed(self, reason):
+        """
+        Closes database connections reused during the crawl
+        """
+        DatabaseHelper.close_connections()
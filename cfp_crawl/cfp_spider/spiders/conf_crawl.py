@@ -113,3 +113,9 @@ class ConferenceCrawlSpider(scrapy.spiders.CrawlSpider):
             error.request.url))
         print(repr(error))
         print("============================")
+
+    def closed(self, reason):
+        """
+        Closes database connections reused during the crawl
+        """
+        DatabaseHelper.close_connections()
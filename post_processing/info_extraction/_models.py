@@ -0,0 +1,43 @@
+import contextlib
+import flair
+import torch
+from functools import lru_cache
+from flair.models import SequenceTagger
+
+# Dynamic int8 quantization of the tagger when running on CPU
+# - Off until its F1 has been checked against the gold-labelled subset
+FLAIR_QUANTIZE = False
+
+
+@lru_cache(maxsize=None)
+def get_flair_ner():
+    """ Loads the Flair NER tagger once, shared by all extractors
+    """
+    tagger = SequenceTagger.load('ner')
+    if FLAIR_QUANTIZE and flair.device.type == 'cpu':
+        tagger = quantize_tagger(tagger)
+    return tagger
+
+
+def quantize_tagger(tagger: SequenceTagger):
+    """ Dynamic int8 quantization of the tagger's own BiLSTM and output layer
+    - The FlairEmbeddings language models are left as is, they call flatten_parameters
+      on their LSTM which quantized LSTMs do not have
+    - quantize_dynamic is only available from torch 1.3, tagger is returned unchanged before that
+    """
+    quantization = getattr(torch, 'quantization', None)
+    if not hasattr(quantization, 'quantize_dynamic'):
+        return tagger
+    qconfig = quantization.default_dynamic_qconfig
+    return quantization.quantize_dynamic(
+        tagger, {'rnn': qconfig, 'linear': qconfig}, dtype=torch.qint8, inplace=True)
+
+
+def flair_autocast():
+    """ FP16 autocast for Flair inference on GPU, no-op on CPU
+    - Flair places the tagger on GPU by itself when CUDA is available
+    """
+    amp = getattr(torch.cuda, 'amp', None)
+    if flair.device.type == 'cuda' and hasattr(amp, 'autocast'):
+        return amp.autocast()
+    return contextlib.ExitStack()
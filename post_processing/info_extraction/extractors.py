@@ -1,10 +1,26 @@
+import logging
 import re
-import flair
 import string
+import numpy as np
+import pandas as pd
 from collections import defaultdict
+from operator import attrgetter
 from flair.data import Sentence
-from flair.models import SequenceTagger
-from .ie_utils import Line, TxFn, full_clean
+from ._models import flair_autocast, get_flair_ner
+from .ie_utils import Line, TxFn, format_line_parts, full_clean
+
+logger = logging.getLogger(__name__)
+
+FLAIR_BATCH_SIZE = 32  # Number of sentences per Flair forward pass
+NER_CACHE_SIZE = 100000  # Maximum number of tagged parts kept by LineNERExtractor
+BRACKET_RE = re.compile('[\(](.*?)[\)]')  # Regex for brackets
+
+# PageLines label column for each extraction type
+LABEL_COLUMNS = {
+    'gold': 'label',
+    'svm_prediction': 'svm_prediction',
+    'dl_prediction': 'dl_prediction'
+}
 
 
 class BlockExtractor:
@@ -18,60 +34,52 @@ class BlockExtractor:
 
     def get_relevant_lines(self, conf_id: int):
         """ Get lines with label != undefined for Conference
+        - Returns DataFrame with the columns of PageLines
         """
-        page_ids = self.cur.execute(
-            'SELECT id FROM ConferencePages WHERE conf_id={}'.format(conf_id)).fetchall()
-        page_ids = [p[0] for p in page_ids]  # Page_id retrieval is tuple
-        all_lines = []
-        for page_id in page_ids:
-            if self.extract_type == 'dl_prediction':
-                lines = self.cur.execute("SELECT * FROM PageLines WHERE \
-                                  page_id=? AND line_text!='' AND (dl_prediction!=?) \
-                                  ORDER BY id", (page_id, 'Undefined')).fetchall()
-            elif self.extract_type == 'gold':
-                lines = self.cur.execute("SELECT * FROM PageLines WHERE \
-                                  page_id=? AND line_text!='' AND label!=? \
-                                  ORDER BY id", (page_id, 'Undefined')).fetchall()
-            else:  # Undefined extraction type
-                return []
-            all_lines += [Line(l) for l in lines]
-        return all_lines
+        if self.extract_type not in LABEL_COLUMNS:  # Undefined extraction type
+            return pd.DataFrame()
+        # Column name is interpolated only after the whitelist check above
+        return pd.read_sql_query("SELECT pl.* FROM PageLines pl \
+                                 JOIN ConferencePages cp ON pl.page_id=cp.id \
+                                 WHERE cp.conf_id=? AND pl.line_text!='' AND pl.{}!=? \
+                                 ORDER BY pl.page_id, pl.id".format(LABEL_COLUMNS[self.extract_type]),
+                                 self.cur.connection, params=(conf_id, 'Undefined'))
 
     def get_relevant_blocks(self, conf_id: int, indent_diff_thresh: int, lnum_diff_thresh: int):
         """ Provides a mapping of Role Labels to Person/Affiliations
         - Groups only for 'Role Label' within threshold of indentation or line_num difference
         - Returns dictionary of {role_label Line : List of Person/Aff Lines/Complex} for further processing
         """
-
-        def within_threshold(line, prev_line, rl_line):
-            """ Ensure threshold diffs 
-            - between indentation of line and role_label
-            - between line_num of line and prev_labelled
-            """
-            indent_thresh = abs(int(line.indentation) - int(rl_line.indentation)) < indent_diff_thresh
-            lnum_thresh = abs(int(line.num) - int(prev_line.num)) < lnum_diff_thresh
-            return indent_thresh and lnum_thresh
-
         relevant_lines = self.get_relevant_lines(conf_id)
         mapping = defaultdict(list)
-
-        role_label: 'Line' = None
-        prev_labelled: 'Line' = None  # Keeps track of last labelled line under current label
-
-        for line in relevant_lines:
-            label = line.label if self.extract_type == 'gold' else line.dl_prediction
-            if label == "Role-Label":
-                role_label = line
-                prev_labelled = line
-            elif role_label:
-                if within_threshold(line, prev_labelled, role_label):
-                    if mapping[role_label]:
-                        mapping[role_label].append(line)
-                    else:
-                        mapping[role_label] = [line]
-                    prev_labelled = line
-            else:
-                pass
+        if relevant_lines.empty:
+            return mapping
+
+        labels = relevant_lines[LABEL_COLUMNS[self.extract_type]].values
+        indents = relevant_lines['indentation'].astype(int).values
+        nums = relevant_lines['line_num'].astype(int).values
+        rows = list(relevant_lines.itertuples(index=False, name=None))
+
+        # Index of the latest Role-Label at or before each line, -1 before the first one
+        rl_mask = labels == "Role-Label"
+        rl_idx = np.maximum.accumulate(np.where(rl_mask, np.arange(len(labels)), -1))
+        # Lines under a role label within indentation threshold of it
+        candidates = ~rl_mask & (rl_idx >= 0) & \
+            (np.abs(indents - indents[np.maximum(rl_idx, 0)]) < indent_diff_thresh)
+
+        # Line_num threshold is against the previously labelled line, so candidates are chained in order
+        role_labels = {}  # Role-Label index to Line
+        nums, rl_idx = nums.tolist(), rl_idx.tolist()
+        cur_rl, prev_num = None, None
+        for idx in np.flatnonzero(candidates).tolist():
+            if rl_idx[idx] != cur_rl:
+                cur_rl = rl_idx[idx]
+                prev_num = nums[cur_rl]
+            if abs(nums[idx] - prev_num) < lnum_diff_thresh:
+                if cur_rl not in role_labels:
+                    role_labels[cur_rl] = Line(rows[cur_rl])
+                mapping[role_labels[cur_rl]].append(Line(rows[idx]))
+                prev_num = nums[idx]
 
         return mapping
 
@@ -79,25 +87,31 @@ class BlockExtractor:
 class LineNERExtractor:
     """Process individual lines with the use of flair
     """
+
     def __init__(self):
-        self.flair_tagger = SequenceTagger.load('ner')
+        # Entities found in previously tagged parts, {part: [(tag, text)]}
+        self.part_entities = {}
+
+    @property
+    def flair_tagger(self):
+        # Loaded on first use, extractors that never tag lines skip loading Flair
+        return get_flair_ner()
 
     def split_line(self, line: 'Line'):
         """ Splits line into potential entity phrases
         - Iteratively split by bracketed text
         - Split by commas
         """
-        b_text = re.compile('[\(](.*?)[\)]')  # Regex for brackets
         ltext = line.text
         split_text = []
-        bracketed = b_text.search(ltext)
+        bracketed = BRACKET_RE.search(ltext)
         start_idx, end_idx = None, None
         while bracketed:
             start_idx, end_idx = bracketed.span()[0], bracketed.span()[1]
             split_text += ltext[:start_idx].split(',')
             split_text += bracketed.group(1).split(',')
             ltext = ltext[end_idx:]
-            bracketed = b_text.search(ltext)
+            bracketed = BRACKET_RE.search(ltext)
         if end_idx:
             split_text += ltext[end_idx:].split(',')
         else:
@@ -110,17 +124,38 @@ class LineNERExtractor:
     def get_line_parts_flair(self, line: 'Line'):
         """ Split by comma since Flair is insensitive to commas
         """
-        line_parts = defaultdict(lambda: None)
-        for part in self.split_line(line):
-            part = Sentence(part)
-            self.flair_tagger.predict(part)
-            for entity in part.get_spans('ner'):
-                # Currently not saving for multiple ner extractions
-                if not line_parts[entity.tag]:
-                    line_parts[entity.tag] = entity.text
-                print(f"{entity.text}, {entity.tag}| ", end="")
-        print()
-        return line_parts
+        return self.get_line_parts_flair_batch([line])[0]
+
+    def get_line_parts_flair_batch(self, lines: 'List[Line]'):
+        """ Tags the comma split parts of all lines with a single Flair prediction
+        - Parts are tagged on their own, so identical parts (e.g. repeated affiliations) are only tagged once
+        - Returns list of line_parts, in the same order as lines
+        """
+        if len(self.part_entities) > NER_CACHE_SIZE:
+            self.part_entities.clear()
+        # Entities are capitalized, all lowercase parts need not be tagged
+        lines_split = [[part for part in self.split_line(line) if not part.islower()]
+                       for line in lines]
+        new_parts = list(dict.fromkeys(
+            part for parts in lines_split for part in parts if part not in self.part_entities))
+        if new_parts:
+            sentences = [Sentence(part) for part in new_parts]
+            with flair_autocast():
+                self.flair_tagger.predict(sentences, mini_batch_size=FLAIR_BATCH_SIZE)
+            for part, sentence in zip(new_parts, sentences):
+                self.part_entities[part] = [(entity.tag, entity.text)
+                                            for entity in sentence.get_spans('ner')]
+
+        all_line_parts = []
+        for parts in lines_split:
+            line_parts = defaultdict(lambda: None)
+            for part in parts:
+                for tag, text in self.part_entities[part]:
+                    # Currently not saving for multiple ner extractions
+                    if not line_parts[tag]:
+                        line_parts[tag] = text
+            all_line_parts.append(line_parts)
+        return all_line_parts
 
 
 class LineInfoExtractorBase:
@@ -131,8 +166,13 @@ class LineInfoExtractorBase:
         self.cur = cur
         # extraction_type of either 'gold' or 'dl_predicted'
         self.extract_type = extract_type
+        # Label attribute of Line for the extraction type
+        self.get_label = attrgetter(LABEL_COLUMNS[extract_type])
         # Set during block processing
         self.conference = None
+        # Relations of the conference, written at the end by write_relations
+        self.affiliation_rels = []
+        self.role_rels = []
         # NER
         self.line_ner_extractor = LineNERExtractor()
 
@@ -149,12 +189,20 @@ class LineInfoExtractorBase:
         return sql_oid
 
     def add_affiliation_rel(self, person_id: 'Tuple', org_id: 'Tuple'):
-        self.cur.execute("INSERT OR IGNORE INTO PersonOrganization (org_id, person_id)\
-                VALUES (?, ?)", (org_id, person_id))
+        self.affiliation_rels.append((org_id, person_id))
 
     def add_role_rel(self, person_id: 'Tuple', role: str):
-        self.cur.execute("INSERT OR IGNORE INTO PersonRole (role_type, conf_id, person_id)\
-                VALUES (?, ?, ?)", (role, self.sql_conf_id, person_id))
+        self.role_rels.append((role, self.sql_conf_id, person_id))
+
+    def write_relations(self):
+        """ Writes relations added since the last write, with one executemany per table
+        """
+        # Duplicates would be ignored on insert, drop them beforehand
+        self.cur.executemany("INSERT OR IGNORE INTO PersonOrganization (org_id, person_id)\
+                VALUES (?, ?)", list(dict.fromkeys(self.affiliation_rels)))
+        self.cur.executemany("INSERT OR IGNORE INTO PersonRole (role_type, conf_id, person_id)\
+                VALUES (?, ?, ?)", list(dict.fromkeys(self.role_rels)))
+        self.affiliation_rels, self.role_rels = [], []
 
     def update_org_loc(self, org_id: int, loc: str):
         self.cur.execute(
@@ -172,8 +220,12 @@ class LineInfoExtractor(LineInfoExtractorBase):
     def __init__(self, cur, extract_type):
         super(LineInfoExtractor, self).__init__(
             cur, extract_type)
+        # line_parts of the lines in the current block, tagged in one batch
+        self.block_line_parts = {}
 
     def get_line_parts(self, line: 'Line'):
+        if line in self.block_line_parts:
+            return self.block_line_parts[line]
         return self.line_ner_extractor.get_line_parts_flair(line)
 
     def process_complex(self, line: 'Line', role_label: 'Line'):
@@ -181,6 +233,8 @@ class LineInfoExtractor(LineInfoExtractorBase):
         - Adds Person to Conference
         """
         line_parts = self.get_line_parts(line)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(format_line_parts(line_parts))
         if line_parts['PER']:
             person_id = self.add_person(line_parts['PER'])
             self.add_role_rel(person_id, role_label.text)
@@ -199,44 +253,55 @@ class LineInfoExtractor(LineInfoExtractorBase):
         person_id = self.add_person(full_clean(person.text))
         self.add_role_rel(person_id, role_label.text)
         if affiliation: # None for processing of person only
-            print("{}, PER| ".format(full_clean(person.text)), end='')
             line_parts = self.get_line_parts(affiliation)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s, PER| %s", full_clean(person.text), format_line_parts(line_parts))
             if line_parts['ORG']:
                 org_id = self.add_organization(line_parts['ORG'])
                 if line_parts['LOC']:
                     self.update_org_loc(org_id, line_parts['LOC'])
                 self.add_affiliation_rel(person_id, org_id)
         else:
-            print("{}, PER| ".format(full_clean(person.text)))
+            logger.debug("%s, PER| ", full_clean(person.text))
 
     def process_block(self, role_label: 'Line', content_lines: 'List[Line]'):
         """ Processes singular block of PageLine ids corresponding to role label and following content
         """
-        print("================= {} =============".format(role_label.text))
-        cur_idx = 0
-        u_person, u_aff = None, None
+        logger.debug("================= %s =============", role_label.text)
+        # Pair up lines first, as (kind, line, affiliation), so NER can be batched over the block
+        actions = []
+        u_person = None
         for cur_line in content_lines:
 
-            label = cur_line.label if self.extract_type == 'gold' else cur_line.dl_prediction
+            label = self.get_label(cur_line)
 
             if label == 'Complex':  # Assume contains person and affiliation
-                self.process_complex(cur_line, role_label)
+                actions.append(('complex', cur_line, None))
             else:
                 if label == 'Person':
                     if u_person:  # If there is already a person just add first
-                        person_id = self.process_person(cur_line, None, role_label)
+                        actions.append(('person', cur_line, None))
                     u_person = cur_line
                 elif label == 'Affiliation':
-                    u_aff = cur_line
                     if u_person:  # Should pair person with affiliation
-                        self.process_person(u_person, u_aff, role_label)
-                        u_person, u_aff = None, None
+                        actions.append(('person', u_person, cur_line))
+                        u_person = None
                 else:
-                    print("Unexpected Label: {} [{}]".format(
-                        cur_line.label, cur_line.text))
-
-            cur_idx += 1
-            prev_line = cur_line
+                    logger.debug("Unexpected Label: %s [%s]", cur_line.label, cur_line.text)
+
+        # Tag every line requiring NER with a single prediction
+        ner_lines = [line if kind == 'complex' else affiliation
+                     for kind, line, affiliation in actions
+                     if kind == 'complex' or affiliation]
+        self.block_line_parts = dict(zip(
+            ner_lines, self.line_ner_extractor.get_line_parts_flair_batch(ner_lines)))
+
+        for kind, line, affiliation in actions:
+            if kind == 'complex':
+                self.process_complex(line, role_label)
+            else:
+                self.process_person(line, affiliation, role_label)
+        self.block_line_parts = {}
 
     def process_conference(self, conference: 'Conference'):
         """ Processes relevant retrieved from BlockExtractor
@@ -246,6 +311,7 @@ class LineInfoExtractor(LineInfoExtractorBase):
         # Process relevant blocks of conference
         for rl_id, content_ids in conference.blocks.items():
             self.process_block(rl_id, content_ids)
+        self.write_relations()
 
 
 class LineInfoExtractor_P(LineInfoExtractorBase):
@@ -290,7 +356,7 @@ class LineInfoExtractor_P(LineInfoExtractorBase):
                 person_id = self.add_person(person)
                 self.add_role_rel(person_id, role_label.text)
                 self.add
-                print(person)
+                logger.debug(person)
 
     def process_person(self, person: 'Line', role_label: 'Line'):
         """ Add Person and corresponding role to database
@@ -299,7 +365,7 @@ class LineInfoExtractor_P(LineInfoExtractorBase):
         if self.valid_person_name(person):
             person_id = self.add_person(person)
             self.add_role_rel(person_id, role_label.text)
-            print(person)
+            logger.debug(person)
 
     def process_complex(self, line: 'Line', role_label: 'Line'):
         """ Specialized processing of Complex Line for Proceedings
@@ -334,7 +400,7 @@ class LineInfoExtractor_P(LineInfoExtractorBase):
             elif ", " in subbed:
                 tokens = subbed.split(",")
             else:
-                print("========= Missed: {}".format(line.text))
+                logger.debug("========= Missed: %s", line.text)
                 return
             person, org = tokens[0], tokens[1]
 
@@ -344,16 +410,16 @@ class LineInfoExtractor_P(LineInfoExtractorBase):
             org_id = self.add_organization(full_clean(org))
             self.add_role_rel(person_id, role_label.text)
             self.add_affiliation_rel(person_id, org_id)
-            print(person, "| PER,", org, "| ORG")
+            logger.debug("%s | PER, %s | ORG", person, org)
 
     def process_block(self, role_label: 'Line', content_lines: 'List[Line]'):
         """ Processes singular block of PageLine ids corresponding to role label and following content
         """
-        print("================= {} =============".format(role_label.text))
+        logger.debug("================= %s =============", role_label.text)
         cur_idx = 0
         person_lines = []
         for cur_line in content_lines:
-            label = cur_line.label if self.extract_type == 'gold' else cur_line.dl_prediction
+            label = self.get_label(cur_line)
 
             if label != 'Person':  # Non person label, process consolidated person lines
                 if person_lines:
@@ -378,3 +444,4 @@ class LineInfoExtractor_P(LineInfoExtractorBase):
         # Process relevant blocks of conference
         for rl_id, content_ids in conference.blocks.items():
             self.process_block(rl_id, content_ids)
+        self.write_relations()
@@ -15,6 +15,10 @@ def clean(ltext: str):
 def full_clean(ltext: str):
     return ltext.strip(string.punctuation)
 
+# Single line summary of extracted entities, e.g. "John Doe, PER| NUS, ORG| "
+def format_line_parts(line_parts: 'Dict'):
+    return "".join(f"{text}, {tag}| " for tag, text in line_parts.items() if text)
+
 class Conference:
     """ ORM for Conference
     """
@@ -42,10 +46,10 @@ class Line:
         self.clean = clean
         self.id = pageline[0]
         self.page_id = pageline[1]
-        self.num = pageline[2]
+        self.num = int(pageline[2])
         self.text = self.clean(pageline[3])
         self.tag = pageline[4]
-        self.indentation = pageline[5]
+        self.indentation = int(pageline[5])
         self.label = pageline[6]
         self.dl_prediction = pageline[7]
         self.svm_prediction = pageline[8]
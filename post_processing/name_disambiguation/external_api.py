@@ -1,7 +1,34 @@
-import editdistance
 import scholarly
 import requests
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from lxml import etree
+from rapidfuzz.distance import Levenshtein
+from rapidfuzz.process import cdist
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+
+ORCID_NAMESPACES = {'common': 'http://www.orcid.org/ns/common',
+                    'person': 'http://www.orcid.org/ns/person',
+                    'personal-details': 'http://www.orcid.org/ns/personal-details',
+                    'activities': 'http://www.orcid.org/ns/activities',
+                    'keyword': 'http://www.orcid.org/ns/keyword'}
+ORCID_WORKERS = 8  # Concurrent ORCID record retrievals per search
+ORCID_CACHE_EXPIRY = 86400  # Seconds to keep cached ORCID responses
+
+
+def orcid_xpath(path: str):
+    """ Compiles XPath query over ORCID namespaces, returning plain strings
+    """
+    return etree.XPath(path, namespaces=ORCID_NAMESPACES, smart_strings=False)
+
+
+# Precompiled XPath queries for ORCID search results and records
+ORCID_PATHS = orcid_xpath('.//common:path/text()')
+ORCID_GIVEN_NAMES = orcid_xpath('.//personal-details:given-names/text()')
+ORCID_FAMILY_NAME = orcid_xpath('.//personal-details:family-name/text()')
+ORCID_AFFILIATIONS = orcid_xpath('.//activities:affiliation-group//common:name/text()')
+ORCID_KEYWORDS = orcid_xpath('.//keyword:content/text()')
 
 
 class Person:
@@ -34,12 +61,20 @@ class API:
         self.aminer = aminer
         self.gscholar = gscholar
         self.dblp = dblp
+        # Pooled keep-alive connections, shared across threads
+        self.session = requests.Session()
+        # ORCID responses are cached on disk so that repeated runs skip the requests
+        self.orcid_session = CachedSession('orcid_cache', expire_after=ORCID_CACHE_EXPIRY)
+        for session in (self.session, self.orcid_session):
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
 
     def aminer_person(self, name: str, num_results):
         """Retrieve aminer results
         """
-        response = requests.get(f"https://api.aminer.org/api/search/person?query={name}",
-                                headers=self.headers)
+        response = self.session.get(f"https://api.aminer.org/api/search/person?query={name}",
+                                    headers=self.headers)
         result = response.json()['result']
 
         collated_data = []
@@ -79,49 +114,37 @@ class API:
 
         return collated_data
 
+    def orcid_record(self, orcid: str):
+        """ Retrieves a single orcId record
+        """
+        data = self.orcid_session.get(f"https://pub.orcid.org/v3.0/{orcid}")
+        data_root = etree.fromstring(data.content)
+        given_name = next(iter(ORCID_GIVEN_NAMES(data_root)), "")
+        family_name = next(iter(ORCID_FAMILY_NAME(data_root)), "")
+        affiliations = list(set(ORCID_AFFILIATIONS(data_root)))
+        keywords = list(set(ORCID_KEYWORDS(data_root)))
+
+        return (orcid, f"{given_name} {family_name}", affiliations, keywords)
+
     def orcid_person(self, name: str, num_results):
         """ Retrieves orcId results
+        - Records of search hits are retrieved concurrently
         """
         start_idx, end_idx = 0, num_results  # Limit to first 3 searches due to time constraint
-        search_res = requests.get(f"https://pub.orcid.org/v3.0/search/?q={name}\
+        search_res = self.orcid_session.get(f"https://pub.orcid.org/v3.0/search/?q={name}\
                                     &start={start_idx}&rows={end_idx}")
-        search_root = ET.fromstring(search_res.text)
+        orcids = ORCID_PATHS(etree.fromstring(search_res.content))
 
-        namespaces = {'common': 'http://www.orcid.org/ns/common',
-                      'person': 'http://www.orcid.org/ns/person',
-                      'personal-details': 'http://www.orcid.org/ns/personal-details',
-                      'activities': 'http://www.orcid.org/ns/activities',
-                      'keyword': 'http://www.orcid.org/ns/keyword'}
-
-        potential_matches = {}
-
-        collated_data = []
-        for el in search_root.findall('*//common:path', namespaces):
-            orcid = el.text
-            data = requests.get(f"https://pub.orcid.org/v3.0/{orcid}")
-            data_root = ET.fromstring(data.text)
-            given_name_el = data_root.find(
-                '*//personal-details:given-names', namespaces)
-            given_name = given_name_el.text if given_name_el != None else ""
-            family_name_el = data_root.find(
-                '*//personal-details:family-name', namespaces)
-            family_name = family_name_el.text if family_name_el != None else ""
-            affiliations = data_root.findall(
-                '*//activities:affiliation-group//common:name', namespaces)
-            affiliations = list(set([aff.text for aff in affiliations]))
-            keywords = data_root.findall('*//keyword:content', namespaces)
-            keywords = list(set([kw.text for kw in keywords]))
-
-            collated_data.append(
-                (orcid, f"{given_name} {family_name}", affiliations, keywords))
+        with ThreadPoolExecutor(max_workers=ORCID_WORKERS) as executor:
+            collated_data = list(executor.map(self.orcid_record, orcids))
 
         return collated_data
 
     def dblp_person(self, name: str, num_results):
         """ Retrieves dblp results
         """
-        search_res = requests.get(f"http://dblp.org/search/author/api?q={name}&h={num_results}",
-                                  headers=self.headers)
+        search_res = self.session.get(f"http://dblp.org/search/author/api?q={name}&h={num_results}",
+                                      headers=self.headers)
         search_root = ET.fromstring(search_res.text)
 
         collated_data = []
@@ -147,42 +170,58 @@ class API:
             [Person]: List of Person
         """
 
-        results = []
-        if self.orcid:
-            orcid_results = self.orcid_person(name, num_to_search)
-            results += [('orcid', *orcid_result) for orcid_result in orcid_results]
-        if self.aminer:
-            aminer_results = self.aminer_person(name, num_to_search)
-            results += [('aminer_id', *aminer_result) for aminer_result in aminer_results]
-        if self.dblp:
-            dblp_results = self.dblp_person(name, num_to_search)
-            results += [('dblp_id', *dblp_result) for dblp_result in dblp_results]
-        if self.gscholar:
+        def gscholar_person(name, num_results):
             try:
-                gscholar_results = self.gscholar_person(name, num_to_search)
-                results += [('gscholar_id', *gscholar_result) for gscholar_result in gscholar_results]
+                return self.gscholar_person(name, num_results)
             except:
                 logger.warn('Failed gscholar retrieval on {}'.format(person_id))
+                return []
+
+        # (id type, retrieval function) for each enabled API, queried concurrently
+        apis = [(id_type, retrieve) for id_type, retrieve, enabled in [
+            ('orcid', self.orcid_person, self.orcid),
+            ('aminer_id', self.aminer_person, self.aminer),
+            ('dblp_id', self.dblp_person, self.dblp),
+            ('gscholar_id', gscholar_person, self.gscholar)
+        ] if enabled]
+        if not apis:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(apis)) as executor:
+            futures = [(id_type, executor.submit(retrieve, name, num_to_search))
+                       for id_type, retrieve in apis]
+            results = [(id_type, *api_result)
+                       for id_type, future in futures for api_result in future.result()]
         return [Person(result) for result in results]
 
     @staticmethod
     def similarity(name1, name2):
         """Computes similarity between the extracted name from external API (1) and
-           original name in database (2) based on editdistance
+           original name in database (2), see similarities
+        """
+        return API.similarities([name1], name2)[0]
+
+    @staticmethod
+    def similarities(names: 'List[str]', name2: str, score_cutoff: int = None):
+        """Computes similarity between each extracted name from external API and
+           original name in database (2) based on editdistance, computed in one batch
         - Permute name to account for difference in First/Last name ordering
         - Check that tokens in original is subset of extracted (assume names from external API are more complete)
+        - Distances above score_cutoff are reported as score_cutoff + 1
         """
-        n1_tokens = name1.split(" ")
         n2_tokens = name2.split(" ")
-        # First token to last position
-        permute1 = " ".join(n1_tokens[1:] + [n1_tokens[0]])
-        # Last token to first position
-        permute2 = " ".join([n1_tokens[-1]] + n1_tokens[:-1])
-
-        if len(n2_tokens) > 1 and set(n2_tokens).issubset(set(n1_tokens)): # Assume name match if token subset
-            return 1
-        return min(
-            editdistance.eval(name1.lower(), name2.lower()),
-            editdistance.eval(permute1.lower(), name2.lower()),
-            editdistance.eval(permute2.lower(), name2.lower())
-        )
+        candidates = []  # Name, first token to last, last token to first
+        for name1 in names:
+            n1_tokens = [token.lower() for token in name1.split(" ")]
+            candidates += [" ".join(n1_tokens),
+                           " ".join(n1_tokens[1:] + [n1_tokens[0]]),
+                           " ".join([n1_tokens[-1]] + n1_tokens[:-1])]
+        if not candidates:
+            return []
+        distances = cdist(candidates, [name2.lower()], scorer=Levenshtein.distance,
+                          score_cutoff=score_cutoff).reshape(-1, 3).min(axis=1)
+
+        n2_token_set = set(n2_tokens)
+        return [1 if len(n2_tokens) > 1 and n2_token_set.issubset(name1.split(" ")) # Assume name match if token subset
+                else int(distance)
+                for name1, distance in zip(names, distances)]
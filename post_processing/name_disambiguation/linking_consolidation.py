@@ -89,8 +89,10 @@ class Consolidator:
         """
         retrieved_persons = self.api.get_person_results(
             person_id, name, org, num_to_search, self.logger)
-        retrieved_persons = list(filter(lambda p: self.api.similarity(
-            p.name, name) < similarity_threshold, retrieved_persons))
+        similarities = self.api.similarities(
+            [p.name for p in retrieved_persons], name, score_cutoff=similarity_threshold)
+        retrieved_persons = [p for p, similarity in zip(retrieved_persons, similarities)
+                             if similarity < similarity_threshold]
         results[index] = retrieved_persons
 
     def save_external_ids(self, cur: 'sqlite3.cursor', person_id: int, results: 'List'):
@@ -1,4 +1,5 @@
 import argparse
+import logging
 import sqlite3
 
 from process_lines import add_page_lines
@@ -10,7 +11,11 @@ from utils import create_tables
 parser = argparse.ArgumentParser(description='')
 parser.add_argument('db_filepath', type=str,
                     help="Specify database file to predict lines")
+parser.add_argument('--verbose', action='store_true',
+                    help="Print entities extracted from each line")
 args = parser.parse_args()
+logging.basicConfig(format='%(message)s',
+                    level=logging.DEBUG if args.verbose else logging.WARNING)
 
 cnx = sqlite3.connect(args.db_filepath)
 cur = cnx.cursor()
@@ -19,6 +19,10 @@ def create_tables(cnx):
         svm_prediction TEXT\
     );")
 
+    # Lookup of a conference's lines, ordered by page and line
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pagelines_page ON PageLines (page_id, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_conferencepages_conf ON ConferencePages (conf_id)")
+
     # Persons and Organizations table
     cur.execute(
         "CREATE TABLE IF NOT EXISTS Persons (\